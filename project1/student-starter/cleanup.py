@@ -7,19 +7,39 @@ Run this between test cycles to start fresh.
 
 Usage:
     python cleanup.py --student-id gsalu --region us-east-1
+    python cleanup.py --student-id gsalu --fast
 
 What it does:
     1. Purges adflow-{id}-input queue
     2. Purges adflow-{id}-results queue
     3. Deletes and recreates adflow-{id}-results DynamoDB table
+
+The three steps touch independent resources, so they run concurrently
+and the whole cleanup takes as long as the slowest step.
+
+With --fast, a table that already has the standard schema is emptied in
+place (skipped entirely if it has no rows) instead of being recreated.
+Tables with more than FAST_CLEAR_MAX_ROWS rows are still recreated.
 """
 
 import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
 from botocore.exceptions import ClientError
 
 
+KEY_SCHEMA = [{"AttributeName": "opportunity_id", "KeyType": "HASH"}]
+
+# Above this many rows, deleting and recreating the table is cheaper
+# than deleting the rows one batch at a time
+FAST_CLEAR_MAX_ROWS = 1000
+
+# Attempts per delete batch before giving up and recreating the table
+FAST_CLEAR_MAX_ATTEMPTS = 5
+
+
 def get_queue_url(sqs, queue_name):
     """Look up a queue URL by name. Returns None if not found."""
     try:
@@ -48,14 +68,101 @@ def purge_queue(sqs, queue_name):
             raise
 
 
-def recreate_table(dynamodb, table_name):
-    """Delete and recreate a DynamoDB table with the standard schema."""
+def wait_for_table(dynamodb, table_name, exists, timeout=60):
+    """
+    Poll until a table is ACTIVE (exists=True) or gone (exists=False).
+
+    Starts at a 0.25s delay and doubles up to 2s, so tables that settle
+    in a few seconds are noticed sooner than with the fixed-delay waiters.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.25
+    while time.monotonic() < deadline:
+        try:
+            desc = dynamodb.describe_table(TableName=table_name)
+            if exists and desc["Table"]["TableStatus"] == "ACTIVE":
+                return
+        except ClientError as e:
+            if "ResourceNotFoundException" not in str(e):
+                raise
+            if not exists:
+                return
+        time.sleep(delay)
+        delay = min(delay * 2, 2.0)
+    state = "ACTIVE" if exists else "deleted"
+    raise TimeoutError(f"Table '{table_name}' not {state} after {timeout}s")
+
+
+def clear_table(dynamodb, table_name):
+    """
+    Empty a table in place without recreating it.
+
+    Returns True if the table is now empty, or False if it needs a full
+    recreate (missing, non-standard schema, too many rows, or deletes still
+    throttled after FAST_CLEAR_MAX_ATTEMPTS). Scans the
+    keys rather than trusting ItemCount, which DynamoDB only refreshes
+    every few hours.
+    """
+    try:
+        desc = dynamodb.describe_table(TableName=table_name)
+    except ClientError as e:
+        if "ResourceNotFoundException" in str(e):
+            return False
+        raise
+    if desc["Table"]["KeySchema"] != KEY_SCHEMA:
+        return False
+
+    keys = []
+    scan_kwargs = {
+        "TableName": table_name,
+        "ProjectionExpression": "opportunity_id",
+        # Rows written just before cleanup must not be missed
+        "ConsistentRead": True,
+    }
+    while True:
+        resp = dynamodb.scan(**scan_kwargs)
+        keys.extend(resp["Items"])
+        if len(keys) > FAST_CLEAR_MAX_ROWS:
+            return False
+        if "LastEvaluatedKey" not in resp:
+            break
+        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    if not keys:
+        print(f"  Table '{table_name}' is already empty -- skipping recreate.")
+        return True
+
+    for i in range(0, len(keys), 25):
+        requests = [{"DeleteRequest": {"Key": key}} for key in keys[i:i + 25]]
+        delay = 0.1
+        for _ in range(FAST_CLEAR_MAX_ATTEMPTS):
+            resp = dynamodb.batch_write_item(RequestItems={table_name: requests})
+            requests = resp.get("UnprocessedItems", {}).get(table_name, [])
+            if not requests:
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+        else:
+            print(f"  Deletes on {table_name} still throttled -- recreating instead.")
+            return False
+    print(f"  Cleared {len(keys)} rows from {table_name}.")
+    return True
+
+
+def recreate_table(dynamodb, table_name, fast=False):
+    """
+    Delete and recreate a DynamoDB table with the standard schema.
+
+    With fast=True, first try to empty the existing table in place.
+    """
+    if fast and clear_table(dynamodb, table_name):
+        return
+
     # Try to delete
     try:
         dynamodb.delete_table(TableName=table_name)
         print(f"  Deleting table: {table_name}...")
-        waiter = dynamodb.get_waiter("table_not_exists")
-        waiter.wait(TableName=table_name, WaiterConfig={"Delay": 2, "MaxAttempts": 30})
+        wait_for_table(dynamodb, table_name, exists=False)
         print(f"  Deleted.")
     except ClientError as e:
         if "ResourceNotFoundException" in str(e):
@@ -69,14 +176,11 @@ def recreate_table(dynamodb, table_name):
         AttributeDefinitions=[
             {"AttributeName": "opportunity_id", "AttributeType": "S"},
         ],
-        KeySchema=[
-            {"AttributeName": "opportunity_id", "KeyType": "HASH"},
-        ],
+        KeySchema=KEY_SCHEMA,
         BillingMode="PAY_PER_REQUEST",
     )
     print(f"  Creating table: {table_name}...")
-    waiter = dynamodb.get_waiter("table_exists")
-    waiter.wait(TableName=table_name, WaiterConfig={"Delay": 2, "MaxAttempts": 30})
+    wait_for_table(dynamodb, table_name, exists=True)
     print(f"  Table ready.")
 
 
@@ -88,7 +192,13 @@ def main():
         "--skip-table", action="store_true",
         help="Skip DynamoDB table recreation (only purge queues)",
     )
+    parser.add_argument(
+        "--fast", action="store_true",
+        help="Empty the table in place instead of recreating it when possible",
+    )
     args = parser.parse_args()
+    if args.fast and args.skip_table:
+        parser.error("--fast has no effect with --skip-table")
 
     sid = args.student_id.lower().strip()
     input_q = f"adflow-{sid}-input"
@@ -102,15 +212,21 @@ def main():
     sqs = boto3.client("sqs", region_name=args.region)
     dynamodb_client = boto3.client("dynamodb", region_name=args.region)
 
-    print("Step 1: Purging input queue")
-    purge_queue(sqs, input_q)
-
-    print("Step 2: Purging results queue")
-    purge_queue(sqs, results_q)
-
-    if not args.skip_table:
-        print("Step 3: Recreating DynamoDB table")
-        recreate_table(dynamodb_client, table_name)
+    print("Purging input queue, purging results queue"
+          + ("" if args.skip_table else ", recreating DynamoDB table"))
+
+    # boto3 clients are thread-safe, so the steps can share them
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(purge_queue, sqs, input_q),
+            executor.submit(purge_queue, sqs, results_q),
+        ]
+        if not args.skip_table:
+            futures.append(executor.submit(
+                recreate_table, dynamodb_client, table_name, args.fast
+            ))
+        for future in futures:
+            future.result()
 
     print()
     print("Cleanup complete. Ready for a fresh test run.")
@@ -0,0 +1,198 @@
+"""
+Tests for the AdFlow cleanup utility.
+
+Run with: pytest tests/test_cleanup.py -v
+
+These tests use moto to mock AWS services. Install it with:
+    pip install moto[sqs,dynamodb]
+"""
+
+import sys
+
+import pytest
+
+# moto must be installed: pip install moto[sqs,dynamodb]
+from moto import mock_aws
+import boto3
+
+import cleanup
+
+
+REGION = "us-east-1"
+TABLE_NAME = "adflow-test-results"
+
+
+# ---------------------------------------------------------------------------
+# Test fixtures
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    """Skip polling and retry delays."""
+    monkeypatch.setattr(cleanup.time, "sleep", lambda seconds: None)
+
+
+@pytest.fixture
+def dynamodb():
+    with mock_aws():
+        yield boto3.client("dynamodb", region_name=REGION)
+
+
+def create_table(dynamodb, key="opportunity_id", rows=0):
+    """Create a results table and fill it with rows numbered 0..rows-1."""
+    dynamodb.create_table(
+        TableName=TABLE_NAME,
+        AttributeDefinitions=[{"AttributeName": key, "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": key, "KeyType": "HASH"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    for i in range(rows):
+        dynamodb.put_item(TableName=TABLE_NAME, Item={key: {"S": f"opp-{i:04d}"}})
+
+
+def row_count(dynamodb):
+    return dynamodb.scan(TableName=TABLE_NAME, Select="COUNT")["Count"]
+
+
+def forbid(monkeypatch, dynamodb, method):
+    """Make a client method fail the test if it is called."""
+    def fail(**kwargs):
+        raise AssertionError(f"{method} should not be called")
+    monkeypatch.setattr(dynamodb, method, fail)
+
+
+# ---------------------------------------------------------------------------
+# Test 1: Fast clear
+# ---------------------------------------------------------------------------
+
+class TestFastClear:
+    """Verify --fast empties the table in place or falls back to recreate."""
+
+    def test_rows_cleared_without_recreate(self, dynamodb, monkeypatch):
+        create_table(dynamodb, rows=60)
+        forbid(monkeypatch, dynamodb, "delete_table")
+
+        cleanup.recreate_table(dynamodb, TABLE_NAME, fast=True)
+
+        assert row_count(dynamodb) == 0
+
+    def test_empty_table_skipped(self, dynamodb, monkeypatch):
+        create_table(dynamodb)
+        forbid(monkeypatch, dynamodb, "delete_table")
+        forbid(monkeypatch, dynamodb, "batch_write_item")
+
+        assert cleanup.clear_table(dynamodb, TABLE_NAME) is True
+
+    def test_scan_pages_are_followed(self, dynamodb, monkeypatch):
+        """Keys on every scan page are deleted."""
+        create_table(dynamodb, rows=7)
+        real_scan = dynamodb.scan
+        pages = []
+
+        def paged_scan(**kwargs):
+            pages.append(kwargs)
+            return real_scan(Limit=3, **kwargs)
+
+        monkeypatch.setattr(dynamodb, "scan", paged_scan)
+
+        assert cleanup.clear_table(dynamodb, TABLE_NAME) is True
+        assert len(pages) == 3
+        assert all(page["ConsistentRead"] for page in pages)
+        monkeypatch.setattr(dynamodb, "scan", real_scan)
+        assert row_count(dynamodb) == 0
+
+    def test_too_many_rows_falls_back_to_recreate(self, dynamodb, monkeypatch):
+        create_table(dynamodb, rows=10)
+        monkeypatch.setattr(cleanup, "FAST_CLEAR_MAX_ROWS", 5)
+        forbid(monkeypatch, dynamodb, "batch_write_item")
+
+        assert cleanup.clear_table(dynamodb, TABLE_NAME) is False
+
+        cleanup.recreate_table(dynamodb, TABLE_NAME, fast=True)
+        assert row_count(dynamodb) == 0
+
+    def test_key_schema_mismatch_falls_back_to_recreate(self, dynamodb):
+        create_table(dynamodb, key="id", rows=3)
+
+        assert cleanup.clear_table(dynamodb, TABLE_NAME) is False
+
+        cleanup.recreate_table(dynamodb, TABLE_NAME, fast=True)
+        schema = dynamodb.describe_table(TableName=TABLE_NAME)["Table"]["KeySchema"]
+        assert schema == cleanup.KEY_SCHEMA
+
+    def test_throttled_deletes_fall_back_to_recreate(self, dynamodb, monkeypatch):
+        create_table(dynamodb, rows=3)
+        calls = []
+
+        def throttled(RequestItems):
+            calls.append(RequestItems)
+            return {"UnprocessedItems": RequestItems}
+
+        monkeypatch.setattr(dynamodb, "batch_write_item", throttled)
+
+        assert cleanup.clear_table(dynamodb, TABLE_NAME) is False
+        assert len(calls) == cleanup.FAST_CLEAR_MAX_ATTEMPTS
+
+
+# ---------------------------------------------------------------------------
+# Test 2: Table recreation and waiting
+# ---------------------------------------------------------------------------
+
+class TestRecreateTable:
+    """Verify recreate_table and wait_for_table against moto."""
+
+    def test_recreate_replaces_existing_table(self, dynamodb):
+        create_table(dynamodb, rows=5)
+
+        cleanup.recreate_table(dynamodb, TABLE_NAME)
+
+        desc = dynamodb.describe_table(TableName=TABLE_NAME)["Table"]
+        assert desc["TableStatus"] == "ACTIVE"
+        assert row_count(dynamodb) == 0
+
+    def test_recreate_creates_missing_table(self, dynamodb):
+        cleanup.recreate_table(dynamodb, TABLE_NAME)
+
+        assert row_count(dynamodb) == 0
+
+    def test_wait_for_table_times_out(self, dynamodb):
+        with pytest.raises(TimeoutError):
+            cleanup.wait_for_table(dynamodb, TABLE_NAME, exists=True, timeout=0)
+
+
+# ---------------------------------------------------------------------------
+# Test 3: Command line
+# ---------------------------------------------------------------------------
+
+class TestMain:
+    """Verify main() purges both queues and resets the table."""
+
+    @mock_aws
+    def test_main_cleans_everything(self, monkeypatch):
+        sqs = boto3.client("sqs", region_name=REGION)
+        dynamodb = boto3.client("dynamodb", region_name=REGION)
+        urls = [
+            sqs.create_queue(QueueName=f"adflow-test-{name}")["QueueUrl"]
+            for name in ("input", "results")
+        ]
+        for url in urls:
+            sqs.send_message(QueueUrl=url, MessageBody="{}")
+        create_table(dynamodb, rows=5)
+
+        monkeypatch.setattr(sys, "argv", ["cleanup.py", "--student-id", "test", "--fast"])
+        cleanup.main()
+
+        for url in urls:
+            attrs = sqs.get_queue_attributes(
+                QueueUrl=url, AttributeNames=["ApproximateNumberOfMessages"]
+            )["Attributes"]
+            assert attrs["ApproximateNumberOfMessages"] == "0"
+        assert row_count(dynamodb) == 0
+
+    def test_fast_with_skip_table_rejected(self, monkeypatch):
+        monkeypatch.setattr(
+            sys, "argv",
+            ["cleanup.py", "--student-id", "test", "--fast", "--skip-table"],
+        )
+        with pytest.raises(SystemExit):
+            cleanup.main()
@@ -6,23 +6,20 @@ This Lambda function processes ad opportunity messages from an SQS queue,
 applies a quality-adjusted scoring function to select winning bids,
 and posts results onward.
 
-Your Tasks:
-    1. implement compute_score()    - the scoring formula
-    2. implement select_winner()    - pick the winning bid
-    3. implement process_opportunity() - full message processing
-    4. implement lambda_handler()   - batch processing with failure handling
-
-Logging and Performance:
-    Use the logger for all output (not print). Example:
-        logger.info("Processed %s in %.1f ms", opportunity_id, elapsed_ms)
-
-    Measure wall-clock time for performance:
-        start = time.perf_counter()
-        # ... do work ...
-        elapsed_ms = (time.perf_counter() - start) * 1000
-        logger.info("Operation took %.1f ms", elapsed_ms)
-
-    To view your logs after deployment:
+Pipeline:
+    compute_score()       - the scoring formula for a single bid
+    select_winner()       - score every bid and pick the winner
+    process_opportunity() - build the result record for one message
+    lambda_handler()      - batch processing with partial-failure reporting;
+                            results are written to DynamoDB and the results
+                            queue in one batched call each
+
+Logging:
+    Each invocation logs one summary line with per-message p50/p99
+    timings, e.g.:
+        Batch complete: n=10 p50=0.1ms p99=0.3ms fail=0 total=42.0ms
+
+    To view the logs after deployment:
         aws logs tail /aws/lambda/adflow-YOURID-worker --follow
 
     To search logs for specific patterns:
@@ -34,14 +31,22 @@ Logging and Performance:
         CloudWatch > Log groups > /aws/lambda/adflow-YOURID-worker
 """
 
-import json
+import math
 import os
 import time
 import logging
-from datetime import datetime, timezone
-from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from json.encoder import encode_basestring_ascii
 
 import boto3
+from botocore.config import Config
+
+# orjson decodes message bodies in C, several times faster than the stdlib
+# parser. Fall back to json if it was not bundled with the deployment.
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 
 # ---------------------------------------------------------------------------
@@ -53,12 +58,40 @@ logger.setLevel(logging.INFO)
 # ---------------------------------------------------------------------------
 # AWS clients - created once per cold start, reused across invocations
 # ---------------------------------------------------------------------------
-sqs = boto3.client("sqs")
-dynamodb = boto3.resource("dynamodb")
+# Keep-alive connections let warm invocations reuse TLS sessions instead of
+# paying a fresh handshake on bursty traffic
+_BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={"mode": "standard", "max_attempts": 3},
+)
+
+# The low-level DynamoDB client takes pre-marshalled items, which skips the
+# resource layer's per-attribute TypeSerializer and its Decimal requirement
+sqs = boto3.client("sqs", config=_BOTO_CONFIG)
+dynamodb_client = boto3.client("dynamodb", config=_BOTO_CONFIG)
+
+# The DynamoDB write and the results-queue send are independent, so they
+# run side by side and a batch pays max(DDB, SQS) latency instead of the sum
+_IO_POOL = ThreadPoolExecutor(max_workers=2)
 
 RESULTS_QUEUE_URL = os.environ.get("RESULTS_QUEUE_URL", "")
 DYNAMO_TABLE_NAME = os.environ.get("DYNAMO_TABLE_NAME", "")
 
+# SQS caps send_message_batch at 10 entries per call, and DynamoDB caps
+# batch_write_item at 25 items per call
+SQS_BATCH_LIMIT = 10
+DYNAMO_BATCH_LIMIT = 25
+DYNAMO_MAX_ATTEMPTS = 3
+
+# Result messages have a fixed schema, so fill a template instead of
+# building a dict and running it through json.dumps for every record
+_RESULT_TMPL = (
+    '{"opportunity_id": %s, "content_category": %s, '
+    '"winning_advertiser_id": %s, "winning_bid_amount": %r, '
+    '"winning_score": %r, "score_margin": %r, "processed_at": %s}'
+)
+
 # ---------------------------------------------------------------------------
 # Scoring constants - from the assignment specification
 # ---------------------------------------------------------------------------
@@ -76,6 +109,10 @@ RELEVANCE_MAP = {
     ("lifestyle", "travel"): 1.2,
 }
 
+# Same multipliers keyed "content|advertiser", so a lookup hashes a string
+# instead of allocating and hashing a tuple for every bid
+RELEVANCE_MAP_FLAT = {f"{a}|{b}": v for (a, b), v in RELEVANCE_MAP.items()}
+
 # Time bonus: (start_hour_inclusive, end_hour_exclusive, bonus)
 TIME_WINDOWS = [
     (6, 9, 1.20),     # Morning commute
@@ -83,6 +120,13 @@ TIME_WINDOWS = [
     (19, 23, 1.25),   # Evening peak
 ]
 
+# Hour -> time bonus, built once so scoring is a single index instead
+# of a scan over TIME_WINDOWS
+HOUR_BONUS = tuple(
+    next((bonus for start, end, bonus in TIME_WINDOWS if start <= hour < end), 1.0)
+    for hour in range(24)
+)
+
 # Device bonus
 DEVICE_BONUS = {
     "mobile": 1.1,
@@ -91,9 +135,42 @@ DEVICE_BONUS = {
 
 
 # ---------------------------------------------------------------------------
-# Task 1: Scoring Function
+# Scoring Function
 # ---------------------------------------------------------------------------
 
+def precompute_opportunity(opportunity):
+    """
+    Compute the scoring terms that are the same for every bid.
+
+    Args:
+        opportunity (dict): Keys: content_category, device_type, timestamp
+
+    Returns:
+        tuple: (relevance_prefix, opp_factor) where relevance_prefix is the
+        "content|" key prefix for RELEVANCE_MAP_FLAT and opp_factor is
+        time_bonus * device_bonus.
+    """
+    # Timestamps are fixed-format ISO 8601 ("2025-03-10T20:15:00Z"), so
+    # slice the hour out directly rather than building a datetime
+    try:
+        hour = int(opportunity["timestamp"][11:13])
+    except (KeyError, TypeError, ValueError):
+        hour = -1
+
+    time_bonus = HOUR_BONUS[hour] if 0 <= hour < 24 else 1.0
+    device_bonus = DEVICE_BONUS.get(opportunity.get("device_type"), 1.0)
+    return f"{opportunity.get('content_category')}|", time_bonus * device_bonus
+
+
+def score_bid(bid, relevance_prefix, opp_factor):
+    """Score one bid against terms from precompute_opportunity()."""
+    bid_amount = float(bid.get("bid_amount") or 0.0)
+    if bid_amount <= 0:
+        return 0.0
+    relevance = RELEVANCE_MAP_FLAT.get(relevance_prefix + (bid.get("category") or ""), 1.0)
+    return bid_amount * relevance * opp_factor
+
+
 def compute_score(bid, opportunity):
     """
     Compute the quality-adjusted score for a single bid.
@@ -108,17 +185,16 @@ def compute_score(bid, opportunity):
     Returns:
         float: the computed score
 
-    TODO: Implement this function. Handle edge cases:
-        - What if bid_amount is missing or zero?
-        - What if the category combination is not in RELEVANCE_MAP?
-        - What if the timestamp cannot be parsed?
+    Edge cases:
+        - Missing or zero bid_amount scores 0.0
+        - Category combinations not in RELEVANCE_MAP get 1.0
+        - An unparseable timestamp gets no time bonus
     """
-    # YOUR CODE HERE
-    raise NotImplementedError("Task 1: Implement compute_score")
+    return score_bid(bid, *precompute_opportunity(opportunity))
 
 
 # ---------------------------------------------------------------------------
-# Task 2: Winner Selection
+# Winner Selection
 # ---------------------------------------------------------------------------
 
 def select_winner(opportunity):
@@ -135,26 +211,69 @@ def select_winner(opportunity):
             winning_score (float)
             score_margin (float) - winning score minus second-place score
         Returns None if there are no valid bids.
-
-    TODO: Implement this function.
-        - Score every bid using compute_score()
-        - Find the highest score (the winner) and second-highest score
-        - Return the result dict with all four fields
     """
-    # YOUR CODE HERE
-    raise NotImplementedError("Task 2: Implement select_winner")
+    # The per-opportunity terms are computed once, so each bid costs one
+    # lookup and two multiplies
+    relevance_prefix, opp_factor = precompute_opportunity(opportunity)
+
+    # Track first and second place in one pass; no need to sort
+    best_score = second_score = float("-inf")
+    best_bid = None
+    for bid in opportunity.get("bids") or []:
+        score = score_bid(bid, relevance_prefix, opp_factor)
+        if score > best_score:
+            second_score = best_score
+            best_score = score
+            best_bid = bid
+        elif score > second_score:
+            second_score = score
+
+    if best_bid is None or best_score <= 0:
+        return None
+    if second_score == float("-inf"):
+        second_score = 0.0
+
+    return {
+        "winning_advertiser_id": best_bid["advertiser_id"],
+        "winning_bid_amount": float(best_bid["bid_amount"]),
+        "winning_score": best_score,
+        "score_margin": best_score - second_score,
+    }
 
 
 # ---------------------------------------------------------------------------
-# Task 3: Process a Single Opportunity
+# Process a Single Opportunity
 # ---------------------------------------------------------------------------
 
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") for the last timestamp generated
+_ISO_SECOND = [None, ""]
+
+
+def _utc_now_iso():
+    """
+    Return the current UTC time as ISO 8601 with milliseconds, e.g.
+    "2025-03-10T20:15:00.123Z".
+
+    Uses time.time() and the C strftime instead of building a datetime,
+    and reuses the formatted seconds prefix while the second is unchanged.
+    """
+    now = time.time()
+    second = int(now)
+    if second != _ISO_SECOND[0]:
+        _ISO_SECOND[0] = second
+        _ISO_SECOND[1] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+    return "%s.%03dZ" % (_ISO_SECOND[1], int((now - second) * 1000))
+
+
 def process_opportunity(opportunity):
     """
     Process one opportunity end-to-end:
         1. Select the winning bid
         2. Construct the result record (see result schema below)
-        3. Send the result where it needs to go
+
+    Writing to DynamoDB and sending to the results queue are left to
+    lambda_handler, which flushes the whole batch with one batch_write_item
+    and one send_message_batch call, issued concurrently.
 
     Result record schema:
         opportunity_id (str)       - copied from input
@@ -163,33 +282,215 @@ def process_opportunity(opportunity):
         winning_bid_amount (float)
         winning_score (float)
         score_margin (float)
-        processed_at (str)         - ISO 8601 timestamp of when you processed it
+        processed_at (str)         - ISO 8601 timestamp of when it was processed
 
     The processed_at timestamp is how latency is measured. The difference
-    between the opportunity's timestamp and your processed_at is the
+    between the opportunity's timestamp and processed_at is the
     end-to-end processing time for that auction.
 
-    Think about:
-        - What gets measured (latency on what path)?
-        - What is the right order of operations for efficiency?
-        - How do you generate the processed_at timestamp?
-
     Args:
         opportunity (dict): A single ad opportunity message.
 
     Returns:
         dict: The result record, or None if no valid bids.
+    """
+    if not opportunity.get("bids"):
+        return None
+
+    winner = select_winner(opportunity)
+    if winner is None:
+        return None
+
+    result = {
+        "opportunity_id": opportunity["opportunity_id"],
+        "content_category": opportunity.get("content_category"),
+        **winner,
+        "processed_at": _utc_now_iso(),
+    }
+    return result
+
+
+def _finite(value):
+    """Return value as a float, rejecting inf/nan (invalid in DynamoDB and JSON)."""
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"non-finite number in result: {value!r}")
+    return value
 
-    TODO: Implement this function.
+
+def _dynamo_number(value):
+    """Marshal a number, rejecting values outside DynamoDB's N range."""
+    value = _finite(value)
+    magnitude = abs(value)
+    if magnitude and not 1e-130 <= magnitude <= 1e125:
+        raise ValueError(f"number out of DynamoDB range in result: {value!r}")
+    return {"N": repr(value)}
+
+
+def _dynamo_str(value):
+    """Marshal an optional string field; None becomes NULL."""
+    return {"NULL": True} if value is None else {"S": str(value)}
+
+
+def _to_dynamo_item(result):
+    """
+    Marshal a result record into DynamoDB's low-level attribute format.
+
+    String fields are coerced with str() so an id sent as a number is
+    stored rather than failing validation, and None becomes NULL. Raises
+    ValueError for anything DynamoDB would reject, since a single invalid
+    item fails the whole batch_write_item request: a missing or empty
+    opportunity_id, and non-finite or out-of-range numbers.
+    """
+    opportunity_id = result.get("opportunity_id")
+    if opportunity_id is None or str(opportunity_id) == "":
+        raise ValueError(f"result has no opportunity_id: {opportunity_id!r}")
+
+    return {
+        "opportunity_id": {"S": str(opportunity_id)},
+        "content_category": _dynamo_str(result["content_category"]),
+        "winning_advertiser_id": _dynamo_str(result["winning_advertiser_id"]),
+        "winning_bid_amount": _dynamo_number(result["winning_bid_amount"]),
+        "winning_score": _dynamo_number(result["winning_score"]),
+        "score_margin": _dynamo_number(result["score_margin"]),
+        "processed_at": {"S": result["processed_at"]},
+    }
+
+
+def _json_str(value):
+    """
+    Encode a string field for _RESULT_TMPL (None becomes null).
+
+    Uses the same ASCII escaping as json.dumps, and coerces non-strings
+    with str() to match how _to_dynamo_item stores them (which likewise
+    stores None as NULL).
+    """
+    return "null" if value is None else encode_basestring_ascii(str(value))
+
+
+def _result_body(result):
+    """
+    Serialize a result record to the JSON body sent to the results queue.
+
+    Raises ValueError for non-finite numbers, which are not valid JSON.
+    """
+    return _RESULT_TMPL % (
+        _json_str(result["opportunity_id"]),
+        _json_str(result["content_category"]),
+        _json_str(result["winning_advertiser_id"]),
+        _finite(result["winning_bid_amount"]),
+        _finite(result["winning_score"]),
+        _finite(result["score_margin"]),
+        _json_str(result["processed_at"]),
+    )
+
+
+def write_results(processed):
+    """
+    Write result records to DynamoDB in batches of up to 25.
+
+    Duplicate opportunity_ids within the batch collapse to the last one
+    (BatchWriteItem rejects duplicate keys in a single request).
+    Unprocessed items are retried with a short backoff.
+
+    Args:
+        processed (list): (message_id, item) pairs, with items already
+            marshalled by _to_dynamo_item().
+
+    Returns:
+        list: message IDs whose results could not be written.
+    """
+    items = {}
+    message_ids = {}
+    for message_id, item in processed:
+        key = item["opportunity_id"]["S"]
+        items[key] = item
+        message_ids.setdefault(key, []).append(message_id)
+
+    keys = list(items)
+    failed = []
+    for i in range(0, len(keys), DYNAMO_BATCH_LIMIT):
+        requests = [
+            {"PutRequest": {"Item": items[key]}}
+            for key in keys[i:i + DYNAMO_BATCH_LIMIT]
+        ]
+        try:
+            for attempt in range(DYNAMO_MAX_ATTEMPTS):
+                if attempt:
+                    time.sleep(0.05 * 2 ** attempt)
+                resp = dynamodb_client.batch_write_item(
+                    RequestItems={DYNAMO_TABLE_NAME: requests}
+                )
+                requests = resp.get("UnprocessedItems", {}).get(DYNAMO_TABLE_NAME, [])
+                if not requests:
+                    break
+        except Exception:
+            logger.exception("Failed to write result batch")
+
+        for request in requests:
+            key = request["PutRequest"]["Item"]["opportunity_id"]["S"]
+            logger.error("Failed to write result for %s", key)
+            failed.extend(message_ids[key])
+    return failed
+
+
+def send_results(processed):
+    """
+    Send result records to the results queue.
+
+    A single result goes out with send_message; anything more is sent
+    with send_message_batch, 10 entries per call.
+
+    Args:
+        processed (list): (message_id, body) pairs, with bodies already
+            serialized by _result_body().
+
+    Returns:
+        list: message IDs whose results could not be sent.
     """
-    # YOUR CODE HERE
-    raise NotImplementedError("Task 3: Implement process_opportunity")
+    if len(processed) == 1:
+        message_id, body = processed[0]
+        try:
+            sqs.send_message(QueueUrl=RESULTS_QUEUE_URL, MessageBody=body)
+        except Exception:
+            logger.exception("Failed to send result for %s", message_id)
+            return [message_id]
+        return []
+
+    entries = [
+        {"Id": message_id, "MessageBody": body}
+        for message_id, body in processed
+    ]
+    failed = []
+    for i in range(0, len(entries), SQS_BATCH_LIMIT):
+        chunk = entries[i:i + SQS_BATCH_LIMIT]
+        try:
+            resp = sqs.send_message_batch(QueueUrl=RESULTS_QUEUE_URL, Entries=chunk)
+        except Exception:
+            logger.exception("Failed to send result batch")
+            failed.extend(entry["Id"] for entry in chunk)
+            continue
+        for entry in resp.get("Failed", []):
+            logger.error(
+                "Failed to send result for %s: %s",
+                entry["Id"], entry.get("Message"),
+            )
+            failed.append(entry["Id"])
+    return failed
 
 
 # ---------------------------------------------------------------------------
-# Task 4: Lambda Entry Point with Batch Processing
+# Lambda Entry Point with Batch Processing
 # ---------------------------------------------------------------------------
 
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already-sorted list (0.0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
 def lambda_handler(event, context):
     """
     Lambda entry point. Receives a batch of SQS messages.
@@ -220,8 +521,69 @@ def lambda_handler(event, context):
 
     Returns:
         dict with batchItemFailures
-
-    TODO: Implement this function.
     """
-    # YOUR CODE HERE
-    raise NotImplementedError("Task 4: Implement lambda_handler")
+    records = event.get("Records")
+    if not records:
+        return {"batchItemFailures": []}
+
+    batch_start = time.perf_counter()
+    failures = []
+    processed = []
+    timings = []
+
+    for record in records:
+        message_id = record["messageId"]
+        start = time.perf_counter()
+        try:
+            opportunity = json_loads(record["body"])
+            result = process_opportunity(opportunity)
+            # Marshal and serialize here so a bad record only fails its
+            # own message
+            if result is not None:
+                item = _to_dynamo_item(result)
+                body = _result_body(result)
+        except Exception:
+            logger.exception("Failed to process message %s", message_id)
+            failures.append({"itemIdentifier": message_id})
+            continue
+
+        # Per-message timings are summarized in one log line per batch
+        timings.append((time.perf_counter() - start) * 1000)
+        if result is None:
+            logger.debug("No valid bids for message %s", message_id)
+            continue
+        processed.append((message_id, item, body))
+
+    # The pool only sees pre-built items and bodies, and both flushes report
+    # failures per message; the except below is a last resort
+    if processed:
+        futures = {
+            "write results to DynamoDB": _IO_POOL.submit(
+                write_results, [(mid, item) for mid, item, _ in processed]
+            ),
+            "send results to SQS": _IO_POOL.submit(
+                send_results, [(mid, body) for mid, _, body in processed]
+            ),
+        }
+        failed_ids = set()
+        for action, future in futures.items():
+            try:
+                failed_ids.update(future.result())
+            except Exception:
+                logger.exception("Failed to %s", action)
+                failed_ids.update(mid for mid, _, _ in processed)
+        failures.extend(
+            {"itemIdentifier": mid}
+            for mid, _, _ in processed
+            if mid in failed_ids
+        )
+
+    batch_ms = (time.perf_counter() - batch_start) * 1000
+    timings.sort()
+    logger.info(
+        "Batch complete: n=%d p50=%.1fms p99=%.1fms fail=%d total=%.1fms",
+        len(records),
+        _percentile(timings, 50), _percentile(timings, 99),
+        len(failures), batch_ms,
+    )
+    return {"batchItemFailures": failures}
@@ -6,7 +6,7 @@ Run with: pytest worker/tests/test_handler.py -v
 These tests use moto to mock AWS services. Install it with:
     pip install moto[sqs,dynamodb]
 
-All three tests must pass before you deploy to AWS.
+All tests must pass before you deploy to AWS.
 """
 
 import json
@@ -23,7 +23,9 @@ from worker.lambda_handler import (
     select_winner,
     lambda_handler,
     RELEVANCE_MAP,
+    _result_body,
 )
+import worker.lambda_handler as handler
 
 
 # ---------------------------------------------------------------------------
@@ -45,6 +47,26 @@ SAMPLE_OPPORTUNITY = {
 }
 
 
+def generate_events(n):
+    """
+    Build an SQS event with n copies of SAMPLE_OPPORTUNITY, numbered
+    test-001, test-002, ...
+
+    The opportunity is serialized once and each copy only swaps in its
+    opportunity_id, which keeps large synthetic batches cheap to build.
+    """
+    base_body = json.dumps(SAMPLE_OPPORTUNITY)
+    return {
+        "Records": [
+            {
+                "messageId": f"msg-{i:03d}",
+                "body": base_body.replace('"test-001"', f'"test-{i:03d}"'),
+            }
+            for i in range(1, n + 1)
+        ]
+    }
+
+
 # ---------------------------------------------------------------------------
 # Test 1: Scoring function
 # ---------------------------------------------------------------------------
@@ -88,6 +110,18 @@ class TestComputeScore:
         score = compute_score(bid, opp)
         assert abs(score - 6.125) < 0.01, f"Expected ~6.125, got {score}"
 
+    def test_missing_or_malformed_timestamp(self):
+        """A timestamp that can't be parsed gets no time bonus (1.0)."""
+        bid = {"advertiser_id": "adv_001", "bid_amount": 3.50, "category": "sportswear"}
+        # 3.50 * 1.4 * 1.0 * 1.1 = 5.39
+        for opp in (
+            {k: v for k, v in SAMPLE_OPPORTUNITY.items() if k != "timestamp"},
+            {**SAMPLE_OPPORTUNITY, "timestamp": "not-a-timestamp"},
+            {**SAMPLE_OPPORTUNITY, "timestamp": None},
+        ):
+            score = compute_score(bid, opp)
+            assert abs(score - 5.39) < 0.01, f"Expected ~5.39, got {score}"
+
 
 # ---------------------------------------------------------------------------
 # Test 2: Winner selection
@@ -116,6 +150,27 @@ class TestSelectWinner:
         result = select_winner(opp)
         assert result is None
 
+    def test_single_bid_margin(self):
+        """With one bid, the margin is measured against 0.0."""
+        opp = {**SAMPLE_OPPORTUNITY, "bids": SAMPLE_OPPORTUNITY["bids"][:1]}
+        result = select_winner(opp)
+        assert result["winning_advertiser_id"] == "adv_001"
+        assert abs(result["score_margin"] - result["winning_score"]) < 1e-9
+
+    def test_tie_keeps_first_bid(self):
+        """Equal scores give a zero margin and the first bid wins."""
+        bid = {"bid_amount": 3.50, "category": "sportswear"}
+        opp = {
+            **SAMPLE_OPPORTUNITY,
+            "bids": [
+                {**bid, "advertiser_id": "adv_001"},
+                {**bid, "advertiser_id": "adv_002"},
+            ],
+        }
+        result = select_winner(opp)
+        assert result["winning_advertiser_id"] == "adv_001"
+        assert result["score_margin"] == 0.0
+
 
 # ---------------------------------------------------------------------------
 # Test 3: Full batch processing (with mocked AWS)
@@ -124,9 +179,16 @@ class TestSelectWinner:
 class TestLambdaHandler:
     """End-to-end test with mocked SQS and DynamoDB."""
 
-    @mock_aws
-    def test_batch_processing(self):
-        """Process a batch of SQS messages and verify results appear."""
+    def test_empty_records(self):
+        """An event with no Records returns no failures without touching AWS."""
+        assert lambda_handler({"Records": []}, None) == {"batchItemFailures": []}
+        assert lambda_handler({}, None) == {"batchItemFailures": []}
+
+    def _setup_aws(self):
+        """
+        Create the mock results queue and table and point the handler at
+        them. Must be called inside @mock_aws. Returns (sqs_client, results_url).
+        """
         region = "us-east-1"
 
         # Create mock resources
@@ -153,28 +215,96 @@ class TestLambdaHandler:
         os.environ["AWS_DEFAULT_REGION"] = region
 
         # Rebuild clients to use moto
-        import worker.lambda_handler as handler
         handler.sqs = boto3.client("sqs", region_name=region)
-        handler.dynamodb = boto3.resource("dynamodb", region_name=region)
+        handler.dynamodb_client = boto3.client("dynamodb", region_name=region)
         handler.RESULTS_QUEUE_URL = results_url
         handler.DYNAMO_TABLE_NAME = "adflow-test-results"
+        return sqs_client, results_url
+
+    def _receive_all(self, sqs_client, results_url):
+        """Drain the results queue and return every message body."""
+        bodies = []
+        while True:
+            msgs = sqs_client.receive_message(
+                QueueUrl=results_url,
+                MaxNumberOfMessages=10,
+            ).get("Messages", [])
+            if not msgs:
+                return bodies
+            bodies.extend(json.loads(m["Body"]) for m in msgs)
+            sqs_client.delete_message_batch(
+                QueueUrl=results_url,
+                Entries=[
+                    {"Id": str(i), "ReceiptHandle": m["ReceiptHandle"]}
+                    for i, m in enumerate(msgs)
+                ],
+            )
+
+    @mock_aws
+    def test_single_record_uses_send_message(self, monkeypatch):
+        """A batch of one goes out with send_message, not send_message_batch."""
+        sqs_client, results_url = self._setup_aws()
+
+        def no_batch(**kwargs):
+            raise AssertionError("send_message_batch called for a single result")
+
+        monkeypatch.setattr(handler.sqs, "send_message_batch", no_batch)
+
+        result = lambda_handler(generate_events(1), None)
+
+        assert result["batchItemFailures"] == []
+        bodies = self._receive_all(sqs_client, results_url)
+        assert [b["opportunity_id"] for b in bodies] == ["test-001"]
+
+    @mock_aws
+    def test_large_batch_is_split_into_chunks_of_ten(self, monkeypatch):
+        """More than 10 results are sent across several send_message_batch calls."""
+        sqs_client, results_url = self._setup_aws()
+
+        chunk_sizes = []
+        real_send = handler.sqs.send_message_batch
+
+        def counting_send(**kwargs):
+            chunk_sizes.append(len(kwargs["Entries"]))
+            return real_send(**kwargs)
+
+        monkeypatch.setattr(handler.sqs, "send_message_batch", counting_send)
+
+        result = lambda_handler(generate_events(11), None)
+
+        assert result["batchItemFailures"] == []
+        assert chunk_sizes == [10, 1]
+        assert len(self._receive_all(sqs_client, results_url)) == 11
+
+    @mock_aws
+    def test_failed_send_entries_become_batch_item_failures(self, monkeypatch):
+        """Entries in the send_message_batch Failed list are retried via SQS."""
+        self._setup_aws()
+
+        def partial_send(QueueUrl, Entries):
+            return {
+                "Successful": [
+                    {"Id": e["Id"], "MessageId": e["Id"], "MD5OfMessageBody": ""}
+                    for e in Entries if e["Id"] != "msg-002"
+                ],
+                "Failed": [
+                    {"Id": "msg-002", "SenderFault": False, "Code": "InternalError"},
+                ],
+            }
+
+        monkeypatch.setattr(handler.sqs, "send_message_batch", partial_send)
+
+        result = lambda_handler(generate_events(3), None)
+
+        assert result["batchItemFailures"] == [{"itemIdentifier": "msg-002"}]
+
+    @mock_aws
+    def test_batch_processing(self):
+        """Process a batch of SQS messages and verify results appear."""
+        sqs_client, results_url = self._setup_aws()
 
         # Build a fake SQS event with two opportunities
-        event = {
-            "Records": [
-                {
-                    "messageId": "msg-001",
-                    "body": json.dumps(SAMPLE_OPPORTUNITY),
-                },
-                {
-                    "messageId": "msg-002",
-                    "body": json.dumps({
-                        **SAMPLE_OPPORTUNITY,
-                        "opportunity_id": "test-002",
-                    }),
-                },
-            ]
-        }
+        event = generate_events(2)
 
         # Invoke the handler
         result = lambda_handler(event, None)
@@ -190,7 +320,177 @@ class TestLambdaHandler:
         assert len(msgs.get("Messages", [])) == 2
 
         # Verify results landed in DynamoDB
-        ddb = boto3.resource("dynamodb", region_name=region)
+        ddb = boto3.resource("dynamodb", region_name="us-east-1")
         table = ddb.Table("adflow-test-results")
         scan = table.scan()
         assert scan["Count"] == 2
+
+    @mock_aws
+    def test_bad_record_fails_only_its_message(self):
+        """
+        An unparseable body fails only its own message. A numeric
+        advertiser_id is stored as a string rather than failing the batch.
+        """
+        sqs_client, results_url = self._setup_aws()
+
+        event = generate_events(2)
+        numeric_adv = json.loads(event["Records"][1]["body"])
+        numeric_adv["bids"] = [{"advertiser_id": 42, "bid_amount": 3.50, "category": "sportswear"}]
+        event["Records"][1]["body"] = json.dumps(numeric_adv)
+        event["Records"].append({"messageId": "msg-bad", "body": "{not json"})
+
+        result = lambda_handler(event, None)
+
+        assert result["batchItemFailures"] == [{"itemIdentifier": "msg-bad"}]
+
+        msgs = sqs_client.receive_message(
+            QueueUrl=results_url,
+            MaxNumberOfMessages=10,
+        )
+        assert len(msgs.get("Messages", [])) == 2
+
+        ddb = boto3.resource("dynamodb", region_name="us-east-1")
+        table = ddb.Table("adflow-test-results")
+        item = table.get_item(Key={"opportunity_id": "test-002"})["Item"]
+        assert item["winning_advertiser_id"] == "42"
+        assert table.scan()["Count"] == 2
+
+    @mock_aws
+    def test_invalid_dynamo_item_fails_only_its_message(self):
+        """
+        Items DynamoDB would reject (empty or null key, out-of-range number)
+        fail only their own message instead of the whole batch_write_item
+        request. A null advertiser_id is stored as NULL, not "None".
+        """
+        sqs_client, results_url = self._setup_aws()
+
+        def body(**overrides):
+            opp = {**SAMPLE_OPPORTUNITY, **overrides}
+            return json.dumps(opp)
+
+        huge_bid = [{"advertiser_id": "adv_001", "bid_amount": 1e300, "category": "sportswear"}]
+        no_adv = [{"advertiser_id": None, "bid_amount": 3.50, "category": "sportswear"}]
+        event = {
+            "Records": [
+                {"messageId": "msg-good", "body": body()},
+                {"messageId": "msg-empty-id", "body": body(opportunity_id="")},
+                {"messageId": "msg-null-id", "body": body(opportunity_id=None)},
+                {"messageId": "msg-huge", "body": body(opportunity_id="test-huge", bids=huge_bid)},
+                {"messageId": "msg-no-adv", "body": body(opportunity_id="test-no-adv", bids=no_adv)},
+            ]
+        }
+
+        result = lambda_handler(event, None)
+
+        assert sorted(f["itemIdentifier"] for f in result["batchItemFailures"]) == [
+            "msg-empty-id", "msg-huge", "msg-null-id",
+        ]
+
+        msgs = sqs_client.receive_message(
+            QueueUrl=results_url,
+            MaxNumberOfMessages=10,
+        )
+        assert len(msgs.get("Messages", [])) == 2
+
+        ddb = boto3.resource("dynamodb", region_name="us-east-1")
+        table = ddb.Table("adflow-test-results")
+        assert table.scan()["Count"] == 2
+        item = table.get_item(Key={"opportunity_id": "test-no-adv"})["Item"]
+        assert item["winning_advertiser_id"] is None
+
+
+# ---------------------------------------------------------------------------
+# Test 4: Result serialization
+# ---------------------------------------------------------------------------
+
+class TestResultBody:
+    """Verify the templated results-queue body is valid, json.dumps-equal JSON."""
+
+    def test_result_body_round_trips(self):
+        """The templated body matches json.dumps, including non-ASCII ids."""
+        result = {
+            "opportunity_id": "caf\u00e9-\"001\"",
+            "content_category": None,
+            "winning_advertiser_id": "adv_001",
+            "winning_bid_amount": 3.5,
+            "winning_score": 6.737500000000001,
+            "score_margin": 0.9625,
+            "processed_at": "2025-03-10T20:15:00.123Z",
+        }
+        body = _result_body(result)
+        assert json.loads(body) == result
+        assert body == json.dumps(result)
+
+
+# ---------------------------------------------------------------------------
+# Test 5: DynamoDB batch writes and retries
+# ---------------------------------------------------------------------------
+
+class FakeDynamoClient:
+    """Records batch_write_item calls and leaves items unprocessed on request."""
+
+    def __init__(self, unprocessed_calls):
+        self.unprocessed_calls = unprocessed_calls
+        self.calls = []
+
+    def batch_write_item(self, RequestItems):
+        self.calls.append(RequestItems)
+        if len(self.calls) <= self.unprocessed_calls:
+            return {"UnprocessedItems": RequestItems}
+        return {"UnprocessedItems": {}}
+
+
+class TestWriteResults:
+    """Verify which message IDs write_results reports as failed."""
+
+    @pytest.fixture(autouse=True)
+    def setup_handler(self, monkeypatch):
+        """Skip retry backoff and give the handler a table name."""
+        monkeypatch.setattr(handler.time, "sleep", lambda seconds: None)
+        monkeypatch.setattr(handler, "DYNAMO_TABLE_NAME", "adflow-test-results")
+
+    def _processed(self, *pairs):
+        """Build (message_id, item) pairs for the given opportunity IDs."""
+        return [
+            (message_id, handler._to_dynamo_item({
+                "opportunity_id": opportunity_id,
+                "content_category": "sports",
+                "winning_advertiser_id": "adv_001",
+                "winning_bid_amount": 3.5,
+                "winning_score": 6.7375,
+                "score_margin": 0.9625,
+                "processed_at": "2025-03-10T20:15:00.123Z",
+            }))
+            for message_id, opportunity_id in pairs
+        ]
+
+    def test_unprocessed_items_are_retried(self, monkeypatch):
+        """Items left unprocessed once succeed on the retry."""
+        client = FakeDynamoClient(unprocessed_calls=1)
+        monkeypatch.setattr(handler, "dynamodb_client", client)
+
+        failed = handler.write_results(self._processed(("m1", "o1"), ("m2", "o2")))
+
+        assert failed == []
+        assert len(client.calls) == 2
+
+    def test_gives_up_after_max_attempts(self, monkeypatch):
+        """Items still unprocessed after DYNAMO_MAX_ATTEMPTS are reported failed."""
+        client = FakeDynamoClient(unprocessed_calls=float("inf"))
+        monkeypatch.setattr(handler, "dynamodb_client", client)
+
+        failed = handler.write_results(self._processed(("m1", "o1"), ("m2", "o2")))
+
+        assert sorted(failed) == ["m1", "m2"]
+        assert len(client.calls) == handler.DYNAMO_MAX_ATTEMPTS
+
+    def test_duplicate_ids_merge_but_keep_every_message(self, monkeypatch):
+        """Duplicate opportunity_ids are written once; a failure fails every message."""
+        client = FakeDynamoClient(unprocessed_calls=float("inf"))
+        monkeypatch.setattr(handler, "dynamodb_client", client)
+
+        failed = handler.write_results(self._processed(("m1", "o1"), ("m2", "o1")))
+
+        requests = client.calls[0]["adflow-test-results"]
+        assert len(requests) == 1
+        assert sorted(failed) == ["m1", "m2"]